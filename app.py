@@ -6,7 +6,10 @@ import requests
 from streamlit_lottie import st_lottie
 from sympy.physics.units import length
 
+import calories
 import database
+import checkpoint
+import telemetry
 from datetime import datetime
 
 # --- 1. CONFIGURATION (Force Sidebar to Open) ---
@@ -69,6 +72,11 @@ def load_lottiefile(filepath):
 
 
 # --- CHECK LOGIN STATUS ---
+# Make sure tables (and any newly added columns) exist before we query them
+database.init_db()
+# Save any trainer session that crashed before it could save itself
+checkpoint.recover_sessions()
+
 # 1. Initialize session state if missing
 if 'user_info' not in st.session_state:
     # Try to load from database first
@@ -76,34 +84,82 @@ if 'user_info' not in st.session_state:
     if db_data:
         st.session_state['user_info'] = db_data
     else:
-        st.session_state['user_info'] = {'name': '', 'age': 0}
-
-# 2. Show Sidebar Setup ONLY if name is missing
-if not st.session_state['user_info']['name']:
+        st.session_state['user_info'] = {'id': None, 'name': '', 'age': 0}
+
+# 2. Member switcher (shared kiosk)
+# Only ids + names are loaded here; each page then queries just the active member's rows,
+# so switching profile never pulls in anybody else's history.
+NEW_MEMBER = "➕ New member"
+members = database.get_users()
+member_names = {member_id: name for member_id, name in members}
+current_id = st.session_state['user_info'].get('id')
+show_setup = not members
+
+if members:
+    options = list(member_names) + [NEW_MEMBER]
+    choice = st.sidebar.selectbox(
+        "👤 Member", options,
+        index=options.index(current_id) if current_id in member_names else 0,
+        format_func=lambda option: member_names.get(option, option)
+    )
+    if choice == NEW_MEMBER:
+        show_setup = True
+    elif choice != current_id:
+        st.session_state['user_info'] = database.get_user_info(choice)
+        st.session_state['balloons_flown'] = []  # Milestones are per person
+        st.rerun()
+
+# 3. Show Sidebar Setup for a new member
+if show_setup:
     with st.sidebar.expander("👤 Set Up Your Profile", expanded=True):
         # We use a FORM so the page doesn't reload on every keystroke
         with st.form("profile_setup"):
             name_input = st.text_input("Enter your name:")
             age_input = st.number_input("Enter your age:", min_value=5, max_value=120, step=1)
             today_calorie_goal = st.number_input("Daily Calorie Goal:", min_value=500, max_value=10000, step=50, value=2000)
+            weight_input = st.number_input("Enter your weight (kg):", min_value=20.0, max_value=300.0, step=0.5, value=70.0)
             submitted = st.form_submit_button("Save Profile")
 
             if submitted:
                 if name_input and age_input:
-                    # Save to Session State (for now)
-                    st.session_state['user_info']['name'] = name_input
-                    st.session_state['user_info']['age'] = age_input
-
-                    st.session_state['user_info']['calorie_goal'] = today_calorie_goal
-
-                    # Save to Database (Forever)
-                    database.save_user_info(name_input, age_input, today_calorie_goal)
+                    # Save to Database (Forever) and switch to the new member
+                    user_id = database.save_user_info(name_input, age_input, today_calorie_goal, weight_input)
+                    st.session_state['user_info'] = database.get_user_info(user_id)
+                    st.session_state['balloons_flown'] = []
 
                     st.success("Profile saved!")
                     st.rerun()  # Force reload to update the "Hello Guest" title immediately
                 else:
                     st.error("Please fill in all fields.")
 
+# 3b. Edit the active member (profiles moved over from the old single-user app have no weight yet)
+elif current_id in member_names:
+    profile = st.session_state['user_info']
+    if not profile.get('weight'):
+        st.sidebar.warning(f"⚖️ No weight on your profile: calories assume {calories.DEFAULT_WEIGHT_KG:g} kg. "
+                           "Add yours under Edit Profile.")
+    with st.sidebar.expander("✏️ Edit Profile", expanded=not profile.get('weight')):
+        # Keys include the member id so switching member doesn't keep the previous member's inputs
+        with st.form(f"profile_edit_{current_id}"):
+            name_edit = st.text_input("Name:", value=profile.get('name') or "", key=f"edit_name_{current_id}")
+            age_edit = st.number_input("Age:", min_value=5, max_value=120, step=1,
+                                       value=min(max(int(profile.get('age') or 5), 5), 120),
+                                       key=f"edit_age_{current_id}")
+            goal_edit = st.number_input("Daily Calorie Goal:", min_value=500, max_value=10000, step=50,
+                                        value=min(max(int(profile.get('calorie_goal') or 2000), 500), 10000),
+                                        key=f"edit_goal_{current_id}")
+            weight_edit = st.number_input("Weight (kg):", min_value=20.0, max_value=300.0, step=0.5,
+                                          value=float(profile.get('weight') or calories.DEFAULT_WEIGHT_KG),
+                                          key=f"edit_weight_{current_id}")
+            if st.form_submit_button("Update Profile"):
+                if name_edit:
+                    database.save_user_info(name_edit, age_edit, goal_edit, weight_edit, user_id=current_id)
+                    st.session_state['user_info'] = database.get_user_info(current_id)
+                    st.success("Profile updated!")
+                    st.rerun()
+                else:
+                    st.error("Please enter a name.")
+
 
 
 # --- 4. SIDEBAR NAVIGATION ---
@@ -121,13 +177,14 @@ if app_mode == "Home":
     st.title("💪 AI Fitness Assistant")
 
     # Get user name and goal
+    user_id = st.session_state['user_info'].get('id')
     user_name = st.session_state['user_info'].get('name', 'Guest')
     daily_goal = st.session_state['user_info'].get('calorie_goal', 2000)  # Default to 2000 if missing
 
     st.header(f"Hello {user_name}! 👋")
 
     # --- NEW: CALORIE PROGRESS SECTION ---
-    today_calories = database.get_today_calories()
+    today_calories = database.get_today_calories(user_id)
 
     # Avoid division by zero
     if daily_goal <= 0: daily_goal = 2000
@@ -171,19 +228,18 @@ if app_mode == "Home":
     st.divider()
 
     # --- METRICS SECTION ---
-    history = database.get_history()
+    # One GROUP BY row per exercise instead of the member's whole history
+    breakdown = database.get_rep_breakdown(user_id)
 
     # Calculate Stats
     total_reps = 0
     total_workouts = 0
     fav_exercise = "None"
 
-    if history:
-        df = pd.DataFrame(history, columns=["ID", "Time", "Exercise", "Reps", "Calories"])
-        total_reps = df['Reps'].sum()
-        total_workouts = len(df)
-        if not df['Exercise'].empty:
-            fav_exercise = df['Exercise'].mode()[0]
+    if breakdown:
+        total_reps = sum(reps for _, reps, _ in breakdown)
+        total_workouts = sum(sessions for _, _, sessions in breakdown)
+        fav_exercise = breakdown[0][0]  # Sorted by number of sessions
 
     # Metrics Columns
     col1, col2, col3 = st.columns(3)
@@ -191,10 +247,8 @@ if app_mode == "Home":
     with col1:
         st.metric("Total Reps", int(total_reps), "⚡")
         with st.expander("Breakdown"):
-            if history:
-                # Group by Exercise and sum Reps
-                rep_breakdown = df.groupby('Exercise')['Reps'].sum()
-                for exercise, reps in rep_breakdown.items():
+            if breakdown:
+                for exercise, reps, _ in sorted(breakdown):
                     # FIX 2: Round the specific exercise counts to 1 decimal place
                     clean_reps = round(reps, 1)
 
@@ -214,12 +268,12 @@ if app_mode == "Home":
             # 1. Date Picker
             selected_date = st.date_input("Select Date", datetime.now())
 
-            # 2. Filter Data for that Date
-            if history:
+            # 2. Fetch just that day's workouts for this member
+            if breakdown:
                 date_str = selected_date.strftime("%Y-%m-%d")  # Match DB format
 
-                # Filter rows where the 'Time' column contains the selected date
-                day_data = df[df['Time'].str.contains(date_str)]
+                day_data = pd.DataFrame(database.get_day_workouts(date_str, user_id),
+                                        columns=["ID", "Time", "Exercise", "Reps", "Calories"])
 
                 if not day_data.empty:
                     # --- FIX: Use 'Calories' because that is what you named it in the DataFrame ---
@@ -261,12 +315,17 @@ elif app_mode == "AI Gym Trainer":
         with st.container(border=True):
             exercise_choice = st.radio("Movement:", ["Bicep Curl", "Squat", "Pushup", "Shoulder Press", "Lunges", "Jumping Jacks", "Planks"])
             st.divider()
-            if st.button("🚀 Launch Camera"):
+            # Workouts are saved per member, so there must be one to save them to
+            has_member = st.session_state['user_info'].get('id') is not None
+            if not has_member:
+                st.warning("Set up your profile in the sidebar before training.")
+            if st.button("🚀 Launch Camera", disabled=not has_member):
                 mode = "curl" if exercise_choice == "Bicep Curl" else "squat" if exercise_choice == "Squat" else "pushup" if exercise_choice == "Pushup" else "shoulder_press" if exercise_choice == "Shoulder Press" else "lunge" if exercise_choice == "Lunges" else "jumping_jack" if exercise_choice == "Jumping Jacks" else "plank"
                 subprocess.run([
                     "C:\\Users\\ankit\\AppData\\Local\\Programs\\Python\\Python310\\python.exe",
                     "main.py",
-                    mode
+                    mode,
+                    str(st.session_state['user_info']['id'])
                 ])
     with col2:
         if exercise_choice == "Bicep Curl":
@@ -318,17 +377,37 @@ elif app_mode == "AI Dietician":
     if st.button("Ask FitBot"):
         if query:
             with st.spinner("Thinking..."):
-                st.markdown(diet_ai.ask_dietician(query))
+                st.markdown(diet_ai.ask_dietician(query, st.session_state['user_info'].get('id')))
 
 # === PAGE: HISTORY ===
 elif app_mode == "History":
     st.title("📈 Workout History")
-    history = database.get_history()
+    history = database.get_history(st.session_state['user_info'].get('id'))
 
     if not history:
         st.info("No workout history found yet.")
     else:
-        df = pd.DataFrame(history, columns=["ID", "Time", "Exercise", "Reps", "Calories"])
+        df = pd.DataFrame(history, columns=["ID", "Time", "Exercise", "Reps", "Calories", "Left", "Right"])
         df = df.sort_values(by="ID", ascending=False)
         st.dataframe(df)
         st.bar_chart(df.set_index("Time")['Reps'])
+
+        # --- RANGE OF MOTION ---
+        # Each session stores a ~300 point angle curve, so this is one small BLOB read.
+        # Only the most recent sessions are offered: labels for a whole history slow every rerun.
+        st.subheader("📐 Range of Motion")
+        RECENT_SESSIONS = 200
+        recent = pd.DataFrame(history[:RECENT_SESSIONS], columns=df.columns)  # history is newest first
+        session_labels = dict(zip(recent['ID'], "#" + recent['ID'].astype(str) + " - " +
+                                   recent['Exercise'].str.title() + " (" + recent['Time'] + ")"))
+        session_id = st.selectbox("Session", list(session_labels), format_func=session_labels.get)
+        if len(history) > RECENT_SESSIONS:
+            st.caption(f"Showing your last {RECENT_SESSIONS} sessions.")
+        points = database.get_trace(session_id)
+        if points:
+            trace = telemetry.decode(points)
+            trace_df = pd.DataFrame({"Seconds": trace['t'], "Angle (°)": trace['angle'].astype(float)})
+            st.line_chart(trace_df.set_index("Seconds"))
+            st.caption(f"Lowest angle: {trace['angle'].min():.0f}°, highest: {trace['angle'].max():.0f}°")
+        else:
+            st.caption("No angle trace was recorded for this session.")
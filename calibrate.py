@@ -0,0 +1,207 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import rep_counter
+
+# --- HOW TO USE ---
+# Put your clips in one folder with a labels.csv next to them:
+#
+#     filename,mode,reps
+#     curl_01.mp4,curl,12
+#     plank_01.mp4,plank,30      <- for plank, "reps" = seconds held
+#
+# Then run:  python calibrate.py path/to/clips
+#
+# Every clip goes through MediaPipe ONCE; the landmarks are cached in <clips>/.landmarks/.
+# After that each threshold candidate is just NumPy over the cached angle series,
+# so the grid search is spread over all CPU cores without touching the pose model again.
+
+CACHE_DIR = ".landmarks"
+NUM_LANDMARKS = 33
+
+# Candidate values for every threshold, per mode (defaults are always included too)
+SEARCH_GRID = {
+    "curl": {"down": range(130, 181, 5), "up": range(10, 61, 5)},
+    "squat": {"up": range(150, 181, 5), "down": range(70, 126, 5)},
+    "pushup": {"down": range(60, 111, 5), "up": range(130, 181, 5)},
+    "shoulder_press": {"down": range(70, 121, 5), "up": range(120, 171, 5)},
+    "lunge": {"up": range(120, 171, 5), "down": range(90, 131, 5),
+              "spread": np.round(np.arange(0.05, 0.31, 0.025), 3)},
+    "jumping_jack": {"spread": np.round(np.arange(0.05, 0.41, 0.01), 2)},
+    "plank": {"angle": range(140, 181, 2), "height": np.round(np.arange(0.1, 0.51, 0.025), 3)},
+}
+
+
+# --- 1. LANDMARK EXTRACTION (runs the pose model, once per clip) ---
+def read_fps(video_path):
+    # Frame rate from the file header (0 / None when the container doesn't say)
+    import cv2
+
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return fps if fps and fps > 0 else None
+
+
+def extract_landmarks(video_path):
+    # Imported here so the search workers never have to load OpenCV / MediaPipe
+    import cv2
+    import mediapipe as mp
+
+    frames = []
+    cap = cv2.VideoCapture(video_path)
+    with mp.solutions.pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
+        while cap.isOpened():
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            results = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            if results.pose_landmarks:
+                frames.append([[lm.x, lm.y, lm.z, lm.visibility] for lm in results.pose_landmarks.landmark])
+            else:
+                frames.append(np.full((NUM_LANDMARKS, 4), np.nan))
+    cap.release()
+
+    return np.asarray(frames, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 4)
+
+
+def load_fps(video_path, meta_path):
+    # The clip's fps is cached in a small .json next to its .npy (plank labels are seconds,
+    # so held frames must be converted with the real frame rate, not an assumed 30 fps)
+    try:
+        with open(meta_path, "r") as f:
+            return json.load(f).get("fps")
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    fps = read_fps(video_path)  # Header read only, no pose model
+    with open(meta_path, "w") as f:
+        json.dump({"fps": fps}, f)
+    return fps
+
+
+def load_landmarks(clips_dir, filename):
+    # Cached per clip; re-extracted only if the video is newer than its cache file.
+    # Returns (landmarks, fps).
+    video_path = os.path.join(clips_dir, filename)
+    cache_base = os.path.join(clips_dir, CACHE_DIR, os.path.splitext(filename)[0])
+    cache_path, meta_path = cache_base + ".npy", cache_base + ".json"
+
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(video_path):
+        return np.load(cache_path), load_fps(video_path, meta_path)
+
+    print(f"Extracting landmarks: {filename}")
+    landmarks = extract_landmarks(video_path)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    np.save(cache_path, landmarks)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)  # The video changed, so its fps may have too
+    return landmarks, load_fps(video_path, meta_path)
+
+
+def load_clips(clips_dir):
+    # Returns {mode: [(features, true_reps), ...]}
+    clips = {}
+    with open(os.path.join(clips_dir, "labels.csv"), newline="") as f:
+        for row in csv.DictReader(f):
+            mode = row["mode"].strip()
+            if mode not in rep_counter.DEFAULT_THRESHOLDS:
+                print(f"Skipping {row['filename']}: unknown mode '{mode}'")
+                continue
+            landmarks, fps = load_landmarks(clips_dir, row["filename"].strip())
+            features = rep_counter.extract_features(landmarks, fps)
+            clips.setdefault(mode, []).append((features, float(row["reps"])))
+    return clips
+
+
+# --- 2. CANDIDATE EVALUATION (runs in the worker processes) ---
+_worker_clips = None
+
+
+def _init_worker(clips):
+    # Each worker receives the cached feature arrays once, not once per candidate
+    global _worker_clips
+    _worker_clips = clips
+
+
+def _evaluate(mode, candidates):
+    # Mean absolute rep error of each candidate over every clip of this mode
+    clips = _worker_clips[mode]
+    return [
+        float(np.mean([abs(rep_counter.count_reps(mode, features, t) - true_reps) for features, true_reps in clips]))
+        for t in candidates
+    ]
+
+
+def build_candidates(mode):
+    keys = list(SEARCH_GRID[mode])
+    default = rep_counter.DEFAULT_THRESHOLDS[mode]
+    # .item() turns NumPy scalars into plain numbers so they can go into thresholds.json
+    candidates = [dict(zip(keys, (v.item() if isinstance(v, np.generic) else v for v in values)))
+                  for values in itertools.product(*(SEARCH_GRID[mode][k] for k in keys))]
+
+    # Arm/count thresholds must keep the same order as the defaults, or stages would never switch
+    if "up" in keys and "down" in keys:
+        candidates = [t for t in candidates if t["up"] != t["down"] and
+                      (t["up"] > t["down"]) == (default["up"] > default["down"])]
+
+    # Defaults go first so they win ties (np.argmin keeps the first minimum)
+    candidates.insert(0, dict(default))
+    return candidates
+
+
+# --- 3. SEARCH ---
+def calibrate(clips, workers=None, chunk_size=200):
+    workers = workers or os.cpu_count() or 1
+    report = {}
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(clips,)) as pool:
+        for mode in clips:
+            candidates = build_candidates(mode)
+            chunks = [candidates[i:i + chunk_size] for i in range(0, len(candidates), chunk_size)]
+            errors = list(itertools.chain.from_iterable(
+                pool.map(_evaluate, itertools.repeat(mode), chunks)
+            ))
+
+            best = int(np.argmin(errors))
+            report[mode] = {
+                "thresholds": candidates[best],
+                "error": errors[best],
+                "default_error": errors[0],
+                "clips": len(clips[mode]),
+            }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate rep thresholds from labelled clips.")
+    parser.add_argument("clips_dir", help="Folder with the clips and labels.csv")
+    parser.add_argument("--workers", type=int, default=None, help="Processes to use (default: all cores)")
+    parser.add_argument("--output", default=rep_counter.THRESHOLDS_FILE, help="Where to write the thresholds")
+    parser.add_argument("--dry-run", action="store_true", help="Print results without saving them")
+    args = parser.parse_args()
+
+    clips = load_clips(args.clips_dir)
+    if not clips:
+        raise SystemExit("No usable clips found in labels.csv.")
+
+    report = calibrate(clips, workers=args.workers)
+
+    print(f"\n{'Mode':<16}{'Clips':>6}{'Old MAE':>10}{'New MAE':>10}  Thresholds")
+    for mode, result in report.items():
+        print(f"{mode:<16}{result['clips']:>6}{result['default_error']:>10.2f}{result['error']:>10.2f}  "
+              f"{result['thresholds']}")
+
+    if not args.dry_run:
+        thresholds = rep_counter.load_thresholds(args.output)
+        for mode, result in report.items():
+            thresholds[mode] = result["thresholds"]
+        rep_counter.save_thresholds(thresholds, args.output)
+        print(f"\nSaved to {args.output} (main.py will pick these up on the next session).")
@@ -0,0 +1,112 @@
+import sqlite3
+import numpy as np
+import pandas as pd
+
+import database
+
+# --- 1. MET TABLE ---
+# Metabolic Equivalent of Task for each trainer mode (Compendium of Physical Activities).
+# 1 MET = 3.5 ml O2 / kg / min, which works out to MET * 3.5 * kg / 200 kcal per minute.
+MET_VALUES = {
+    "curl": 3.5,
+    "squat": 5.0,
+    "pushup": 3.8,
+    "shoulder_press": 3.5,
+    "lunge": 4.0,
+    "jumping_jack": 8.0,
+    "plank": 3.8,
+}
+DEFAULT_MET = 3.5
+
+# Used when a session has no measured duration (old rows saved before we tracked time).
+# Plank "reps" are already seconds, so it gets 1.0.
+SECONDS_PER_REP = {
+    "curl": 3.0,
+    "squat": 4.0,
+    "pushup": 3.0,
+    "shoulder_press": 3.0,
+    "lunge": 4.0,
+    "jumping_jack": 1.5,
+    "plank": 1.0,
+}
+DEFAULT_SECONDS_PER_REP = 3.0
+
+DEFAULT_WEIGHT_KG = 70.0
+
+
+# --- 2. SINGLE SESSION ---
+def calculate_calories(exercise_type, reps, duration_sec=None, weight_kg=None):
+    met = MET_VALUES.get(exercise_type, DEFAULT_MET)
+    if not weight_kg or weight_kg <= 0:
+        weight_kg = DEFAULT_WEIGHT_KG
+    if not duration_sec or duration_sec <= 0:
+        duration_sec = reps * SECONDS_PER_REP.get(exercise_type, DEFAULT_SECONDS_PER_REP)
+
+    kcal = met * 3.5 * weight_kg / 200 * (duration_sec / 60)
+    return round(kcal, 2)
+
+
+# --- 3. VECTORIZED BATCH ---
+def calculate_calories_batch(df, weight_kg=None):
+    # df needs 'exercise_type', 'reps' and 'duration' columns (duration may be NULL/NaN)
+    # and optionally a per-row 'weight' column; weight_kg fills in where that is missing.
+    # Same formula as calculate_calories(), but one NumPy pass over the whole frame.
+    if not weight_kg or weight_kg <= 0:
+        weight_kg = DEFAULT_WEIGHT_KG
+    if 'weight' in df:
+        weight = pd.to_numeric(df['weight'], errors='coerce').to_numpy(dtype=float)
+        weight = np.where(np.isnan(weight) | (weight <= 0), weight_kg, weight)
+    else:
+        weight = weight_kg
+
+    met = df['exercise_type'].map(MET_VALUES).fillna(DEFAULT_MET).to_numpy(dtype=float)
+    sec_per_rep = df['exercise_type'].map(SECONDS_PER_REP).fillna(DEFAULT_SECONDS_PER_REP).to_numpy(dtype=float)
+    reps = pd.to_numeric(df['reps'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    duration = pd.to_numeric(df['duration'], errors='coerce').to_numpy(dtype=float)
+
+    # Fall back to the rep-based estimate wherever duration is missing
+    duration = np.where(np.isnan(duration) | (duration <= 0), reps * sec_per_rep, duration)
+
+    kcal = met * (3.5 * weight / 200) * (duration / 60)
+    return np.round(kcal, 2)
+
+
+def recompute_history(weight_kg=None, chunk_size=50000):
+    # Rewrites 'score' for every row in 'workouts' with the current MET model.
+    # Each workout uses its member's weight; weight_kg is only the fallback for
+    # members without one. Rows are walked in id order chunk by chunk (keeps memory
+    # flat on big DBs), but everything happens inside ONE transaction so a failure changes nothing.
+    conn = sqlite3.connect(database.DB_NAME)
+    updated = 0
+    try:
+        conn.execute('BEGIN')
+        last_id = 0
+        while True:
+            chunk = pd.read_sql_query(
+                'SELECT w.id, w.exercise_type, w.reps, w.duration, u.weight '
+                'FROM workouts w LEFT JOIN users u ON u.id = w.user_id '
+                'WHERE w.id > ? ORDER BY w.id LIMIT ?',
+                conn, params=(last_id, chunk_size)
+            )
+            if chunk.empty:
+                break
+
+            scores = calculate_calories_batch(chunk, weight_kg)
+            conn.executemany(
+                'UPDATE workouts SET score = ? WHERE id = ?',
+                zip(scores.tolist(), chunk['id'].tolist())
+            )
+            updated += len(chunk)
+            last_id = int(chunk['id'].iloc[-1])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return updated
+
+
+if __name__ == "__main__":
+    database.init_db()
+    print(f"Recomputed calories for {recompute_history()} workouts.")
@@ -0,0 +1,190 @@
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import calories
+import database
+
+# --- HOW IT WORKS ---
+# The trainer hands us its latest state every frame (just a tuple swap in memory, no disk I/O).
+# A background thread writes that state to a small JSON file every few seconds, atomically.
+# If the trainer never gets to save (crash, killed, power cut...) the file is left behind,
+# and recover_sessions() turns it into a workout on the next start. Journals of trainers
+# that are still running are left alone: the PID must be alive AND the journal touched
+# recently (the writer touches it every HEARTBEAT_INTERVAL even when idle), so a PID the OS
+# has handed to some other program can't hide an orphaned journal for ever. Every session has its own id and
+# workouts.session_id is UNIQUE, so a session is one row; if it is saved twice, the copy
+# with the longer duration wins (see database.save_workout).
+
+JOURNAL_DIR = ".checkpoints"  # read at call time, so tools can point it elsewhere (see loadtest.py)
+CHECKPOINT_INTERVAL = 2.0  # seconds
+HEARTBEAT_INTERVAL = 60.0  # an idle trainer still touches its journal this often
+ORPHAN_AFTER = HEARTBEAT_INTERVAL * 5  # untouched for this long = its trainer is gone, whatever the PID says
+
+
+class SessionJournal:
+    def __init__(self, mode, user_id=None, interval=CHECKPOINT_INTERVAL, journal_dir=None):
+        journal_dir = journal_dir or JOURNAL_DIR
+        self.session_id = uuid.uuid4().hex
+        self.mode = mode
+        self.user_id = user_id
+        self.interval = interval
+        self.path = os.path.join(journal_dir, f"{self.session_id}.json")
+
+        self._latest = None
+        self._written = None
+        self._written_at = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+        os.makedirs(journal_dir, exist_ok=True)
+        self._thread.start()
+
+    def update(self, counter, stage, duration, side_counts=None):
+        # Called from the frame loop: only swaps a reference, the writer thread does the rest.
+        # duration is the active exercise time so far (what calories are based on).
+        self._latest = (counter, stage, duration, tuple(side_counts) if side_counts else None)
+
+    def close(self):
+        # Session saved properly (or nothing to save): stop writing and drop the journal
+        self._stop.set()
+        self._thread.join()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            snapshot = self._latest
+            # Compared by value: the trainer hands over a new tuple every frame even when idle
+            try:
+                if snapshot is not None and snapshot != self._written:
+                    self._write(snapshot)
+                    self._written = snapshot
+                    self._written_at = time.monotonic()
+                elif self._written is not None and time.monotonic() - self._written_at >= HEARTBEAT_INTERVAL:
+                    # Nothing new, just show recovery we're alive (mtime only, no rewrite / fsync)
+                    os.utime(self.path)
+                    self._written_at = time.monotonic()
+            except OSError as e:
+                print(f"⚠️ Checkpoint failed: {e}")
+
+    def _write(self, snapshot):
+        counter, stage, duration, side_counts = snapshot
+        data = {
+            'session_id': self.session_id,
+            'pid': os.getpid(),
+            'user_id': self.user_id,
+            'mode': self.mode,
+            'counter': counter,
+            'stage': stage,
+            'duration': round(duration, 1),
+            'side_counts': side_counts,
+            'updated_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        # Write to a temp file then rename, so a crash mid-write never leaves half a journal
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+def save_session(session_id, mode, counter, duration, user_id=None, timestamp=None, trace=None,
+                 side_counts=None):
+    # Shared by the trainer (normal exit) and recovery, so both score calories the same way.
+    # trace is the packed angle curve from telemetry.summarize() (only known on a normal exit).
+    # side_counts is [left, right] reps for curls / lunges, None for two-sided exercises.
+    profile = database.get_user_info(user_id)
+    weight = profile.get('weight') if profile else None
+    data = {
+        'exercise_type': mode,
+        'reps': counter,
+        'score': calories.calculate_calories(mode, counter, duration, weight),
+        'duration': round(duration, 1),
+        'session_id': session_id,
+        'timestamp': timestamp,
+        'reps_left': side_counts[0] if side_counts else None,
+        'reps_right': side_counts[1] if side_counts else None,
+    }
+    if not database.save_workout(data, user_id):
+        return None  # A more complete copy of this session is already saved
+    if trace:
+        database.save_trace(session_id, trace)
+    return data
+
+
+def _process_running(pid):
+    # True if a process with this PID exists right now
+    if os.name == "nt":
+        # os.kill() would terminate the process on Windows, so ask the kernel instead
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        exit_code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+        kernel32.CloseHandle(handle)
+        return exit_code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Exists, just owned by someone else
+    return True
+
+
+def recover_sessions(journal_dir=None):
+    # Saves every session left behind by a trainer that didn't exit cleanly. Safe to call
+    # from several places: a session that is already saved is only updated if this copy is
+    # more complete, then its journal is removed.
+    journal_dir = journal_dir or JOURNAL_DIR
+    if not os.path.isdir(journal_dir):
+        return []
+
+    database.init_db()
+    recovered = []
+    for filename in sorted(os.listdir(journal_dir)):
+        path = os.path.join(journal_dir, filename)
+        if filename.endswith(".tmp"):
+            # Leftover from a write that never finished; the previous .json is still intact
+            if time.time() - os.path.getmtime(path) > 60:
+                os.remove(path)
+            continue
+        if not filename.endswith(".json"):
+            continue
+
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Skipping unreadable checkpoint {filename}: {e}")
+            continue
+
+        # The trainer that owns this journal is still running (maybe just stalled): it will save
+        # the session itself. Its writer thread keeps touching the file even if the camera froze,
+        # so a live PID on a long-untouched journal is a reused PID, not our trainer.
+        age = time.time() - os.path.getmtime(path)
+        pid = data.get('pid')
+        if pid is None:
+            running = age < CHECKPOINT_INTERVAL * 3  # Journal from before PIDs were recorded
+        else:
+            running = pid != os.getpid() and age < ORPHAN_AFTER and _process_running(pid)
+        if running:
+            continue
+
+        if data['counter'] > 0:
+            saved = save_session(data['session_id'], data['mode'], data['counter'],
+                                 data['duration'], data['user_id'], data['updated_at'],
+                                 side_counts=data.get('side_counts'))
+            if saved:
+                recovered.append(saved)
+        os.remove(path)
+    return recovered
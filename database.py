@@ -1,11 +1,43 @@
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 
 DB_NAME = "fitness_logs.db"
 
+def _add_column_if_missing(c, table, column, col_type):
+    c.execute(f'PRAGMA table_info({table})')
+    if column not in [row[1] for row in c.fetchall()]:
+        c.execute(f'ALTER TABLE {table} ADD COLUMN {column} {col_type}')
+
+def _table_exists(c, table):
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table,))
+    return c.fetchone() is not None
+
+def _day_range(date_str):
+    # Timestamps are 'YYYY-MM-DD HH:MM:SS' strings, so a whole day is a simple range.
+    # Unlike "LIKE 'date%'" this can use the (user_id, timestamp) index.
+    next_day = (datetime.strptime(date_str, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+    return date_str, next_day
+
+def _user_filter(user_id):
+    # user_id=None means "everyone" (old single-user callers, admin scripts)
+    if user_id is None:
+        return '', ()
+    return ' AND user_id = ?', (user_id,)
+
 def init_db():
     conn = sqlite3.connect(DB_NAME)
     c = conn.cursor()
+    # Table for gym members (one row per person using the kiosk)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            age INTEGER,
+            calorie_goal INTEGER,
+            weight REAL,
+            created_at TEXT
+        )
+    ''')
     # Table for individual workout logs
     c.execute('''
         CREATE TABLE IF NOT EXISTS workouts (
@@ -13,83 +45,204 @@ def init_db():
             timestamp TEXT,
             exercise_type TEXT,
             reps INTEGER,
-            score INTEGER
+            score INTEGER,
+            duration REAL,
+            user_id INTEGER REFERENCES users(id),
+            session_id TEXT,
+            reps_left INTEGER,
+            reps_right INTEGER
         )
     ''')
-    # Table for user profile (Notice the fixed commas and 'goal' column)
+    # Downsampled joint-angle curve per workout (kept out of 'workouts' so history queries stay small)
     c.execute('''
-        CREATE TABLE IF NOT EXISTS user_info (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            age INTEGER,
-            calorie_goal INTEGER
+        CREATE TABLE IF NOT EXISTS workout_traces (
+            workout_id INTEGER PRIMARY KEY REFERENCES workouts(id),
+            points BLOB
         )
     ''')
+    # Upgrade databases created before these columns existed
+    _add_column_if_missing(c, 'workouts', 'duration', 'REAL')
+    _add_column_if_missing(c, 'workouts', 'user_id', 'INTEGER REFERENCES users(id)')
+    _add_column_if_missing(c, 'workouts', 'session_id', 'TEXT')
+    _add_column_if_missing(c, 'workouts', 'reps_left', 'INTEGER')
+    _add_column_if_missing(c, 'workouts', 'reps_right', 'INTEGER')
+
+    # Every per-user query filters on user_id and a timestamp range/order
+    c.execute('CREATE INDEX IF NOT EXISTS idx_workouts_user_time ON workouts (user_id, timestamp)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_workouts_user_exercise ON workouts (user_id, exercise_type)')
+    # A trainer session can be saved on exit AND recovered from its checkpoint; this keeps it to one row
+    c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_workouts_session ON workouts (session_id)')
+
+    # Old single-profile databases: move the 'user_info' person into 'users'
+    # and give them every workout that was logged before user_id existed.
+    c.execute('SELECT COUNT(*) FROM users')
+    if c.fetchone()[0] == 0 and _table_exists(c, 'user_info'):
+        _add_column_if_missing(c, 'user_info', 'weight', 'REAL')
+        c.execute('SELECT name, age, calorie_goal, weight FROM user_info LIMIT 1')
+        row = c.fetchone()
+        if row:
+            c.execute('''
+                INSERT INTO users (name, age, calorie_goal, weight, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', row + (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),))
+            c.execute('UPDATE workouts SET user_id = ? WHERE user_id IS NULL', (c.lastrowid,))
     conn.commit()
     conn.close()
 
-def save_workout(workout):
+def save_workout(workout, user_id=None):
+    # A session_id is stored once. If it is saved again (checkpoint recovery racing the trainer's
+    # own save) the copy with the longer duration wins, so a stale checkpoint can't overwrite the
+    # final numbers. Returns False if an existing, more complete copy was kept instead.
     conn = sqlite3.connect(DB_NAME)
     c = conn.cursor()
     c.execute('''
-        INSERT INTO workouts (timestamp, exercise_type, reps, score)
-        VALUES (?, ?, ?, ?)
+        INSERT INTO workouts (timestamp, exercise_type, reps, score, duration, user_id, session_id,
+                              reps_left, reps_right)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(session_id) DO UPDATE SET
+            reps = excluded.reps,
+            score = excluded.score,
+            duration = excluded.duration,
+            reps_left = excluded.reps_left,
+            reps_right = excluded.reps_right
+        WHERE excluded.duration >= workouts.duration
     ''', (
-        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        workout.get('timestamp') or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         workout['exercise_type'],
         workout['reps'],
-        workout['score']
+        workout['score'],
+        workout.get('duration'),
+        user_id,
+        workout.get('session_id'),
+        workout.get('reps_left'),
+        workout.get('reps_right')
     ))
+    saved = c.rowcount > 0
+    conn.commit()
+    conn.close()
+    return saved
+
+def save_trace(session_id, points):
+    # Attaches a packed angle trace (see telemetry.py) to the workout saved for this session
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
+    c.execute('''
+        INSERT OR REPLACE INTO workout_traces (workout_id, points)
+        SELECT id, ? FROM workouts WHERE session_id = ?
+    ''', (points, session_id))
     conn.commit()
     conn.close()
 
-def get_history():
+def get_trace(workout_id):
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
+    c.execute('SELECT points FROM workout_traces WHERE workout_id = ?', (workout_id,))
+    row = c.fetchone()
+    conn.close()
+    return row[0] if row else None
+
+def get_history(user_id=None):
+    # Rows: id, timestamp, exercise_type, reps, score, reps_left, reps_right (per-limb: curls / lunges)
     conn = sqlite3.connect(DB_NAME)
     c = conn.cursor()
-    c.execute('SELECT * FROM workouts ORDER BY timestamp DESC')
+    where, params = _user_filter(user_id)
+    c.execute('SELECT id, timestamp, exercise_type, reps, score, reps_left, reps_right FROM workouts WHERE 1=1'
+              + where + ' ORDER BY timestamp DESC', params)
     rows = c.fetchall()
     conn.close()
     return rows
 
 # --- NEW: Helper to calculate total calories for TODAY ---
-def get_today_calories():
+def get_today_calories(user_id=None):
+    today = datetime.now().strftime("%Y-%m-%d")
+    return get_day_calories(today, user_id)
+
+def get_day_calories(date_str, user_id=None):
     conn = sqlite3.connect(DB_NAME)
     c = conn.cursor()
-    # Get today's date string (YYYY-MM-DD)
-    today = datetime.now().strftime("%Y-%m-%d")
-    # Sum scores where the timestamp starts with today's date
-    c.execute("SELECT SUM(score) FROM workouts WHERE timestamp LIKE ?", (today + '%',))
+    start, end = _day_range(date_str)
+    where, params = _user_filter(user_id)
+    c.execute('SELECT SUM(score) FROM workouts WHERE timestamp >= ? AND timestamp < ?' + where,
+              (start, end) + params)
     result = c.fetchone()[0]
     conn.close()
     return result if result else 0
 
-def save_user_info(name, age, goal):
+# --- DASHBOARD AGGREGATES (done in SQL so we never load a member's whole history) ---
+def get_rep_breakdown(user_id=None):
+    # [(exercise, total_reps, sessions), ...] most-done exercise first
     conn = sqlite3.connect(DB_NAME)
     c = conn.cursor()
-    # Clear old profile to keep only one user
-    c.execute('DELETE FROM user_info')
-    c.execute('''
-        INSERT INTO user_info (name, age, calorie_goal)
-        VALUES (?, ?, ?)
-    ''', (name, age, goal))
+    where, params = _user_filter(user_id)
+    c.execute('SELECT exercise_type, SUM(reps), COUNT(*) FROM workouts WHERE 1=1' + where
+              + ' GROUP BY exercise_type ORDER BY COUNT(*) DESC', params)
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+def get_day_workouts(date_str, user_id=None):
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
+    start, end = _day_range(date_str)
+    where, params = _user_filter(user_id)
+    c.execute('SELECT id, timestamp, exercise_type, reps, score FROM workouts '
+              'WHERE timestamp >= ? AND timestamp < ?' + where + ' ORDER BY timestamp', (start, end) + params)
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+# --- USER PROFILES ---
+def save_user_info(name, age, goal, weight=None, user_id=None):
+    # Creates a new member, or updates an existing one when user_id is given. Returns the id.
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
+    if user_id is None:
+        c.execute('''
+            INSERT INTO users (name, age, calorie_goal, weight, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (name, age, goal, weight, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        user_id = c.lastrowid
+        # The very first member also gets anything trained before a profile existed
+        c.execute('SELECT COUNT(*) FROM users')
+        if c.fetchone()[0] == 1:
+            c.execute('UPDATE workouts SET user_id = ? WHERE user_id IS NULL', (user_id,))
+    else:
+        c.execute('''
+            UPDATE users SET name = ?, age = ?, calorie_goal = ?, weight = ?
+            WHERE id = ?
+        ''', (name, age, goal, weight, user_id))
     conn.commit()
     conn.close()
+    return user_id
+
+def get_users():
+    # Just ids and names for the profile switcher
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
+    c.execute('SELECT id, name FROM users ORDER BY name COLLATE NOCASE')
+    rows = c.fetchall()
+    conn.close()
+    return rows
 
-def get_user_info():
+def get_user_info(user_id=None):
+    # Without a user_id this returns the first member (old single-user behaviour)
     conn = sqlite3.connect(DB_NAME)
     c = conn.cursor()
     # Safety check if table exists
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='user_info'")
-    if not c.fetchone():
+    if not _table_exists(c, 'users'):
+        conn.close()
         return None
 
-    c.execute('SELECT name, age, calorie_goal FROM user_info LIMIT 1')
+    if user_id is None:
+        c.execute('SELECT id, name, age, calorie_goal, weight FROM users ORDER BY id LIMIT 1')
+    else:
+        c.execute('SELECT id, name, age, calorie_goal, weight FROM users WHERE id = ?', (user_id,))
     row = c.fetchone()
     conn.close()
 
     if row:
-        return {'name': row[0], 'age': row[1], 'calorie_goal': row[2]}
+        return {'id': row[0], 'name': row[1], 'age': row[2], 'calorie_goal': row[3], 'weight': row[4]}
     return None
 
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    init_db()
@@ -24,13 +24,13 @@ else:
     model = None
 
 
-def ask_dietician(user_question):
+def ask_dietician(user_question, user_id=None):
     # Safety Check
     if model is None:
         return "⚠️ **Error:** API Key is missing. Please check `.streamlit/API.txt`."
 
     # Get User Context from Database
-    user_info = database.get_user_info()
+    user_info = database.get_user_info(user_id)
     user_age = user_info['age'] if user_info else 25  # Default to 25 if unknown
     user_name = user_info['name'] if user_info else "User"
 
@@ -0,0 +1,250 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import calories
+import checkpoint
+import database
+
+# --- HOW TO USE ---
+# 1. Fill a separate database with fake members and years of workouts:
+#        python loadtest.py generate --rows 2000000 --users 500
+# 2. Drive the dashboard headlessly (Streamlit AppTest) with several sessions at once,
+#    one process per session (AppTest is not safe to run from several threads):
+#        python loadtest.py run --sessions 8 --reruns 20
+#
+# Both default to loadtest.db so your real fitness_logs.db is never touched (nor the real
+# .checkpoints/ folder: crashed trainer sessions are left for the real app to recover).
+# 'run' prints per-page latency percentiles + peak memory; --json saves them as a baseline.
+
+LOADTEST_DB = "loadtest.db"
+PAGES = ["Home", "History", "AI Gym Trainer"]
+
+# Typical session size per exercise: (mean reps, std). Plank "reps" are seconds held.
+REP_PROFILE = {
+    "curl": (12, 4),
+    "squat": (15, 5),
+    "pushup": (15, 6),
+    "shoulder_press": (10, 3),
+    "lunge": (12, 4),
+    "jumping_jack": (30, 10),
+    "plank": (45, 20),
+}
+# How popular each exercise is (same order as REP_PROFILE)
+EXERCISE_WEIGHTS = [0.22, 0.18, 0.18, 0.1, 0.1, 0.12, 0.1]
+
+
+# --- 1. SYNTHETIC DATA ---
+def generate(db_path=LOADTEST_DB, rows=1_000_000, users=200, years=3, batch_size=100_000, seed=42):
+    rng = np.random.default_rng(seed)
+    database.DB_NAME = db_path
+    database.init_db()
+
+    conn = sqlite3.connect(db_path)
+    # Bulk load settings: this is a throwaway database, so trade durability for speed
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA journal_mode = MEMORY')
+    conn.execute('BEGIN')
+
+    now = time.time()
+    created = time.strftime("%Y-%m-%d %H:%M:%S")
+    weights = rng.normal(75, 12, users).clip(45, 140).round(1)
+    user_rows = [(f"Member {i + 1}", int(rng.integers(16, 70)), int(rng.integers(15, 60)) * 50, float(weights[i]), created)
+                 for i in range(users)]
+    conn.executemany('INSERT INTO users (name, age, calorie_goal, weight, created_at) VALUES (?, ?, ?, ?, ?)',
+                     user_rows)
+    first_id = conn.execute('SELECT MAX(id) FROM users').fetchone()[0] - users + 1
+    user_weight = dict(zip(range(first_id, first_id + users), weights))
+
+    exercises = np.array(list(REP_PROFILE))
+    means = np.array([REP_PROFILE[e][0] for e in exercises], dtype=float)
+    stds = np.array([REP_PROFILE[e][1] for e in exercises], dtype=float)
+    sec_per_rep = np.array([calories.SECONDS_PER_REP[e] for e in exercises])
+
+    inserted = 0
+    while inserted < rows:
+        n = min(batch_size, rows - inserted)
+
+        # Some members are much more active than others (Zipf-like)
+        user_ids = first_id + (rng.zipf(1.3, n) - 1) % users
+        ex_idx = rng.choice(len(exercises), n, p=EXERCISE_WEIGHTS)
+        reps = np.maximum(1, rng.normal(means[ex_idx], stds[ex_idx])).round()
+        duration = (reps * sec_per_rep[ex_idx] * rng.uniform(0.8, 1.4, n)).round(1)
+
+        # Spread over the last N years, mostly in gym hours (6:00 - 22:00)
+        days_ago = rng.integers(0, 365 * years, n)
+        seconds = rng.integers(6 * 3600, 22 * 3600, n)
+        day_start = (now - days_ago * 86400) // 86400 * 86400
+        stamps = pd.to_datetime(day_start + seconds, unit='s').strftime("%Y-%m-%d %H:%M:%S")
+
+        batch = pd.DataFrame({
+            'exercise_type': exercises[ex_idx],
+            'reps': reps,
+            'duration': duration,
+            'weight': pd.Series(user_ids).map(user_weight).to_numpy(),
+        })
+        scores = calories.calculate_calories_batch(batch)
+
+        conn.executemany(
+            'INSERT INTO workouts (timestamp, exercise_type, reps, score, duration, user_id) VALUES (?, ?, ?, ?, ?, ?)',
+            zip(stamps, batch['exercise_type'].tolist(), reps.astype(int).tolist(), scores.tolist(),
+                duration.tolist(), user_ids.tolist())
+        )
+        inserted += n
+        print(f"  {inserted:,} / {rows:,} workouts")
+
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+    return inserted
+
+
+# --- 2. HEADLESS DASHBOARD SESSIONS ---
+def _find(widgets, label):
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    raise LookupError(f"No widget labelled {label!r}")
+
+
+def _init_worker(db_path):
+    # Runs once in each worker process: app.py imports these same database / checkpoint modules.
+    # The app recovers crashed sessions on every rerun, so give it a journal folder of its own.
+    database.DB_NAME = db_path
+    checkpoint.JOURNAL_DIR = db_path + ".checkpoints"
+
+
+def _run_session(session_no, reruns, member_ids, timeout):
+    # One simulated browser tab in its own process: pick a member, then keep hopping between pages.
+    # Returns (timings, peak RSS of this process in MB).
+    from streamlit.testing.v1 import AppTest
+
+    rng = np.random.default_rng(session_no)
+    timings = {page: [] for page in PAGES}
+    peak_rss = _PeakRSS()
+    peak_rss.start()
+
+    at = AppTest.from_file("app.py", default_timeout=timeout)
+    at.run()
+    if member_ids:
+        # Options are the member ids in name order (+ "New member" last), so pick by index
+        _find(at.sidebar.selectbox, "👤 Member").select_index(int(rng.integers(len(member_ids))))
+
+    for i in range(reruns):
+        page = PAGES[i % len(PAGES)]
+        _find(at.sidebar.selectbox, "Choose Module").select(page)
+
+        start = time.perf_counter()
+        at.run()
+        timings[page].append(time.perf_counter() - start)
+
+        if at.exception:
+            peak_rss.stop()
+            raise RuntimeError(f"Session {session_no} crashed on {page}: {at.exception[0].message}")
+
+    peak_rss.stop()
+    return timings, peak_rss.peak_mb
+
+
+def run(db_path=LOADTEST_DB, sessions=4, reruns=15, timeout=60):
+    database.DB_NAME = db_path
+    member_ids = [member_id for member_id, _ in database.get_users()]
+
+    wall_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=sessions, initializer=_init_worker, initargs=(db_path,)) as pool:
+        results = list(pool.map(_run_session, range(sessions), [reruns] * sessions,
+                                [member_ids] * sessions, [timeout] * sessions))
+    wall = time.perf_counter() - wall_start
+
+    # Each session's process reports its own peak; None when RSS can't be measured on this OS
+    rss = [peak for _, peak in results if peak is not None]
+    report = {"sessions": sessions, "reruns_per_session": reruns, "wall_seconds": round(wall, 2),
+              "peak_rss_mb": max(rss) if rss else None,
+              "total_peak_rss_mb": round(sum(rss), 1) if rss else None, "pages": {}}
+    for page in PAGES:
+        samples = np.array([t for timings, _ in results for t in timings[page]]) * 1000
+        if samples.size:
+            p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+            report["pages"][page] = {"runs": int(samples.size), "p50_ms": round(p50, 1),
+                                     "p95_ms": round(p95, 1), "p99_ms": round(p99, 1),
+                                     "max_ms": round(samples.max(), 1)}
+    return report
+
+
+class _PeakRSS:
+    # Samples the process RSS in the background (psutil if installed, else ru_maxrss, else nothing).
+    # tracemalloc would also work but slows every allocation, which would skew the latencies.
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_mb = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        try:
+            import resource  # Unix only; ru_maxrss is KB on Linux
+            self.peak_mb = max(self.peak_mb or 0, round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1))
+        except ImportError:
+            pass
+
+    def _sample(self):
+        try:
+            import psutil
+        except ImportError:
+            return
+        process = psutil.Process(os.getpid())
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb or 0, round(process.memory_info().rss / 2 ** 20, 1))
+            self._stop.wait(self.interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic data + headless load test for the dashboard.")
+    parser.add_argument("--db", default=LOADTEST_DB, help="Database file to fill / test against")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gen = commands.add_parser("generate", help="Fill the database with synthetic members and workouts")
+    gen.add_argument("--rows", type=int, default=1_000_000)
+    gen.add_argument("--users", type=int, default=200)
+    gen.add_argument("--years", type=int, default=3)
+    gen.add_argument("--seed", type=int, default=42)
+
+    bench = commands.add_parser("run", help="Drive Home / History / Gym Trainer in concurrent sessions")
+    bench.add_argument("--sessions", type=int, default=4)
+    bench.add_argument("--reruns", type=int, default=15)
+    bench.add_argument("--timeout", type=float, default=60, help="Seconds allowed per rerun")
+    bench.add_argument("--json", help="Also save the report to this file (to compare against later)")
+
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        start = time.perf_counter()
+        count = generate(args.db, args.rows, args.users, args.years, seed=args.seed)
+        print(f"Inserted {count:,} workouts into {args.db} in {time.perf_counter() - start:.1f}s")
+    else:
+        report = run(args.db, args.sessions, args.reruns, args.timeout)
+        print(f"\n{args.sessions} sessions x {args.reruns} reruns in {report['wall_seconds']}s")
+        print(f"{'Page':<16}{'Runs':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for page, stats in report["pages"].items():
+            print(f"{page:<16}{stats['runs']:>6}{stats['p50_ms']:>10}{stats['p95_ms']:>10}"
+                  f"{stats['p99_ms']:>10}{stats['max_ms']:>10}")
+        if report['peak_rss_mb'] is None:
+            print("Peak memory (RSS): n/a (pip install psutil)")
+        else:
+            print(f"Peak memory (RSS): {report['peak_rss_mb']} MB per session (max), "
+                  f"{report['total_peak_rss_mb']} MB across all sessions")
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=4)
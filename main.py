@@ -2,7 +2,12 @@ import cv2
 import mediapipe as mp
 import numpy as np
 import sys
+import time
+import traceback
 import database  # Import your database to save results
+import checkpoint
+import rep_counter
+import telemetry
 
 # --- 1. SETUP & SOUND SAFETY ---
 # This block ensures the code runs on any computer without crashing
@@ -20,11 +25,15 @@ except ImportError:
     def play_sound():
         pass
 
-# Get the mode from the app
+# Get the mode (and which member is training) from the app
 if len(sys.argv) > 1:
     mode = sys.argv[1]
 else:
     mode = "curl"
+user_id = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2] else None
+
+# Rep thresholds for this mode (defaults, or calibrated values from thresholds.json)
+t = rep_counter.load_thresholds().get(mode, {})
 
 mp_drawing = mp.solutions.drawing_utils
 mp_pose = mp.solutions.pose
@@ -45,12 +54,46 @@ def calculate_angle(a, b, c):
     return angle
 
 
-# --- 3. VIDEO CAPTURE ---
+# --- 3. RECOVER CRASHED SESSIONS ---
+# Anything a previous run checkpointed but never saved goes into the database now (exactly once)
+database.init_db()
+if user_id is None:
+    # Started without a member (e.g. from the command line): train as the first one,
+    # like the old single-user app, so the workout doesn't end up belonging to nobody
+    profile = database.get_user_info()
+    user_id = profile['id'] if profile else None
+for recovered in checkpoint.recover_sessions():
+    print(f"Recovered unsaved session: {recovered['exercise_type']}, {recovered['reps']} reps.")
+
+# --- 4. VIDEO CAPTURE ---
 cap = cv2.VideoCapture(0)
 
 # Global Variables
 counter = 0
 stage = None
+start_time = time.time()
+
+# Active time for the MET calorie model: only frames where the athlete is actually exercising.
+# Camera warm-up, nobody in frame and standing still between sets don't count.
+MOVING_DEG_PER_SEC = 20  # primary angle changing faster than this = moving
+ACTIVE_GRACE = 2.0       # pauses at the top/bottom of a rep still count as active
+MAX_FRAME_GAP = 0.5      # a stalled camera read can't add more than this per frame
+active_time = 0.0
+last_frame_time = start_time
+last_moving_time = None
+prev_angle = None
+frame_errors = 0
+trace = telemetry.AngleTrace()  # Range-of-motion curve for the History page
+
+# Left/right tracking: the better-seen side is followed automatically (with hysteresis),
+# and curls / lunges also keep a separate rep count per limb
+UNILATERAL_MODES = ("curl", "lunge")
+side_selector = rep_counter.SideSelector()
+side_counts = [0, 0]
+side_stage = [None, None]
+
+# Background checkpointing of this session (the frame loop never touches the disk)
+journal = checkpoint.SessionJournal(mode, user_id)
 
 # Setup MediaPipe instance
 with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
@@ -59,6 +102,11 @@ with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as
         if not ret:
             break
 
+        # Real time since the previous frame (webcam pose tracking is often 10-20 fps, not 30)
+        now = time.time()
+        frame_dt = min(now - last_frame_time, MAX_FRAME_GAP)
+        last_frame_time = now
+
         # Recolor image to RGB
         image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         image.flags.writeable = False
@@ -71,28 +119,37 @@ with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as
         image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
 
         # Extract landmarks
+        primary_angle = None  # The joint angle this mode is judged on (recorded in the trace)
         try:
             landmarks = results.pose_landmarks.landmark
 
+            # One (33, 4) array per frame: x, y, z, visibility. Both the left and right chain
+            # are measured from it in a single NumPy call, so facing either way works.
+            points = np.array([[lm.x, lm.y, lm.z, lm.visibility] for lm in landmarks])
+
             # ==========================================================
-            # ISLAND 1: BICEP CURL
+            # ISLAND 1: BICEP CURL (each arm counted on its own)
             # ==========================================================
             if mode == "curl":
-                shoulder = [landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].x,
-                            landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].y]
-                elbow = [landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].x,
-                         landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].y]
-                wrist = [landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].x,
-                         landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].y]
-
-                angle = calculate_angle(shoulder, elbow, wrist)
-
-                if angle > 160:
-                    stage = "down"
-                if angle < 30 and stage == 'down':
-                    stage = "up"
-                    counter += 1
-                    play_sound()  # Safe sound call
+                angles, visibility = rep_counter.bilateral_angles(points, rep_counter.ARM)
+                side = side_selector.update(visibility)
+
+                for s in (rep_counter.LEFT, rep_counter.RIGHT):
+                    if visibility[s] < rep_counter.MIN_VISIBILITY:
+                        continue  # Hidden arm: MediaPipe is only guessing, don't count it
+                    if angles[s] > t["down"]:
+                        side_stage[s] = "down"
+                    if angles[s] < t["up"] and side_stage[s] == 'down':
+                        side_stage[s] = "up"
+                        side_counts[s] += 1
+                        play_sound()  # Safe sound call
+
+                # Both arms together or one at a time: the session is the better arm's count
+                counter = max(side_counts)
+                stage = side_stage[side]
+                angle = angles[side]
+                primary_angle = angle
+                elbow = points[rep_counter.ARM[side][1], :2]
 
                 cv2.putText(image, str(int(angle)),
                             tuple(np.multiply(elbow, [640, 480]).astype(int)),
@@ -102,18 +159,15 @@ with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as
             # ISLAND 2: SQUAT
             # ==========================================================
             elif mode == "squat":
-                hip = [landmarks[mp_pose.PoseLandmark.LEFT_HIP.value].x,
-                       landmarks[mp_pose.PoseLandmark.LEFT_HIP.value].y]
-                knee = [landmarks[mp_pose.PoseLandmark.LEFT_KNEE.value].x,
-                        landmarks[mp_pose.PoseLandmark.LEFT_KNEE.value].y]
-                ankle = [landmarks[mp_pose.PoseLandmark.LEFT_ANKLE.value].x,
-                         landmarks[mp_pose.PoseLandmark.LEFT_ANKLE.value].y]
-
-                angle = calculate_angle(hip, knee, ankle)
+                angles, visibility = rep_counter.bilateral_angles(points, rep_counter.LEG)
+                side = side_selector.update(visibility)
+                angle = angles[side]
+                primary_angle = angle
+                knee = points[rep_counter.LEG[side][1], :2]
 
-                if angle > 170:
+                if angle > t["up"]:
                     stage = "up"
-                if angle < 90 and stage == 'up':
+                if angle < t["down"] and stage == 'up':
                     stage = "down"
                     counter += 1
                     play_sound()
@@ -126,18 +180,15 @@ with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as
             # ISLAND 3: PUSHUP
             # ==========================================================
             elif mode == "pushup":
-                shoulder = [landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].x,
-                            landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].y]
-                elbow = [landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].x,
-                         landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].y]
-                wrist = [landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].x,
-                         landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].y]
+                angles, visibility = rep_counter.bilateral_angles(points, rep_counter.ARM)
+                side = side_selector.update(visibility)
+                angle = angles[side]
+                primary_angle = angle
+                elbow = points[rep_counter.ARM[side][1], :2]
 
-                angle = calculate_angle(shoulder, elbow, wrist)
-
-                if angle <= 80:
+                if angle <= t["down"]:
                     stage = "down"
-                if angle > 160 and stage == 'down':
+                if angle > t["up"] and stage == 'down':
                     stage = "up"
                     counter += 1
                     play_sound()
@@ -150,18 +201,15 @@ with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as
             # ISLAND 4: SHOULDER PRESS
             # ==========================================================
             elif mode == "shoulder_press":
-                shoulder = [landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].x,
-                            landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].y]
-                elbow = [landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].x,
-                         landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].y]
-                wrist = [landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].x,
-                         landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].y]
-
-                angle = calculate_angle(shoulder, elbow, wrist)
+                angles, visibility = rep_counter.bilateral_angles(points, rep_counter.ARM)
+                side = side_selector.update(visibility)
+                angle = angles[side]
+                primary_angle = angle
+                elbow = points[rep_counter.ARM[side][1], :2]
 
-                if angle < 90:
+                if angle < t["down"]:
                     stage = "down"
-                if angle > 140 and stage == 'down':
+                if angle > t["up"] and stage == 'down':
                     stage = "up"
                     counter += 1
                     play_sound()
@@ -171,34 +219,24 @@ with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as
                             cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2, cv2.LINE_AA)
 
             # ==========================================================
-            # ISLAND 5: LUNGE
+            # ISLAND 5: LUNGE (each rep credited to the front leg)
             # ==========================================================
             elif mode == "lunge":
-                l_hip = [landmarks[mp_pose.PoseLandmark.LEFT_HIP.value].x,
-                         landmarks[mp_pose.PoseLandmark.LEFT_HIP.value].y]
-                l_knee = [landmarks[mp_pose.PoseLandmark.LEFT_KNEE.value].x,
-                          landmarks[mp_pose.PoseLandmark.LEFT_KNEE.value].y]
-                l_ankle = [landmarks[mp_pose.PoseLandmark.LEFT_ANKLE.value].x,
-                           landmarks[mp_pose.PoseLandmark.LEFT_ANKLE.value].y]
-                r_hip = [landmarks[mp_pose.PoseLandmark.RIGHT_HIP.value].x,
-                         landmarks[mp_pose.PoseLandmark.RIGHT_HIP.value].y]
-                r_knee = [landmarks[mp_pose.PoseLandmark.RIGHT_KNEE.value].x,
-                          landmarks[mp_pose.PoseLandmark.RIGHT_KNEE.value].y]
-                r_ankle = [landmarks[mp_pose.PoseLandmark.RIGHT_ANKLE.value].x,
-                           landmarks[mp_pose.PoseLandmark.RIGHT_ANKLE.value].y]
-
-                l_angle = calculate_angle(l_hip, l_knee, l_ankle)
-                r_angle = calculate_angle(r_hip, r_knee, r_ankle)
-                ankle_distance = abs(l_ankle[0] - r_ankle[0])
-
-                if l_angle > 140 and r_angle > 140:
+                angles, visibility = rep_counter.bilateral_angles(points, rep_counter.LEG)
+                l_angle, r_angle = angles
+                l_knee = points[rep_counter.LEFT_KNEE, :2]
+                ankle_distance = abs(points[rep_counter.LEFT_ANKLE, 0] - points[rep_counter.RIGHT_ANKLE, 0])
+                primary_angle = min(l_angle, r_angle)  # The working (front) leg
+
+                if l_angle > t["up"] and r_angle > t["up"]:
                     stage = "up"
 
                 if stage == 'up':
-                    if (l_angle < 110 or r_angle < 110):
-                        if ankle_distance > 0.15:
+                    if (l_angle < t["down"] or r_angle < t["down"]):
+                        if ankle_distance > t["spread"]:
                             stage = "down"
                             counter += 1
+                            side_counts[int(np.argmin(angles))] += 1  # The more bent knee leads
                             play_sound()
                         else:
                             cv2.putText(image, "SPREAD LEGS!", (50, 100),
@@ -212,25 +250,19 @@ with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as
                             cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
 
             # ==========================================================
-            # ISLAND 6: JUMPING JACKS
+            # ISLAND 6: JUMPING JACKS (already uses both sides)
             # ==========================================================
             elif mode == "jumping_jack":
-                left_shoulder = [landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].x,
-                                 landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].y]
-                right_shoulder = [landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value].x,
-                                  landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value].y]
-                left_ankle = [landmarks[mp_pose.PoseLandmark.LEFT_ANKLE.value].x,
-                              landmarks[mp_pose.PoseLandmark.LEFT_ANKLE.value].y]
-                right_ankle = [landmarks[mp_pose.PoseLandmark.RIGHT_ANKLE.value].x,
-                               landmarks[mp_pose.PoseLandmark.RIGHT_ANKLE.value].y]
-                left_wrist = [landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].x,
-                              landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].y]
-                right_wrist = [landmarks[mp_pose.PoseLandmark.RIGHT_WRIST.value].x,
-                               landmarks[mp_pose.PoseLandmark.RIGHT_WRIST.value].y]
-
-                ankle_distance = abs(left_ankle[0] - right_ankle[0])
+                left_shoulder = points[rep_counter.LEFT_SHOULDER, :2]
+                right_shoulder = points[rep_counter.RIGHT_SHOULDER, :2]
+                left_wrist = points[rep_counter.LEFT_WRIST, :2]
+                right_wrist = points[rep_counter.RIGHT_WRIST, :2]
+                left_hip = points[rep_counter.LEFT_HIP, :2]
+
+                ankle_distance = abs(points[rep_counter.LEFT_ANKLE, 0] - points[rep_counter.RIGHT_ANKLE, 0])
+                primary_angle = calculate_angle(left_hip, left_shoulder, left_wrist)  # Arm raise
                 are_hands_up = (left_wrist[1] < left_shoulder[1]) and (right_wrist[1] < right_shoulder[1])
-                are_feet_apart = ankle_distance > 0.2
+                are_feet_apart = ankle_distance > t["spread"]
 
                 if not are_hands_up and not are_feet_apart:
                     stage = "down"
@@ -246,28 +278,26 @@ with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as
             # ISLAND 7: PLANK
             # ==========================================================
             elif mode == "plank":
-                left_shoulder = [landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].x,
-                                 landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].y]
-                left_hip = [landmarks[mp_pose.PoseLandmark.LEFT_HIP.value].x,
-                            landmarks[mp_pose.PoseLandmark.LEFT_HIP.value].y]
-                left_ankle = [landmarks[mp_pose.PoseLandmark.LEFT_ANKLE.value].x,
-                              landmarks[mp_pose.PoseLandmark.LEFT_ANKLE.value].y]
+                angles, visibility = rep_counter.bilateral_angles(points, rep_counter.BODY)
+                side = side_selector.update(visibility)
+                shoulder_idx, _, ankle_idx = rep_counter.BODY[side]
 
-                shoulder_hip_angle = calculate_angle(left_shoulder, left_hip, left_ankle)
-                height_diff = abs(left_shoulder[1] - left_ankle[1])
+                shoulder_hip_angle = angles[side]
+                primary_angle = shoulder_hip_angle
+                height_diff = abs(points[shoulder_idx, 1] - points[ankle_idx, 1])
 
-                if shoulder_hip_angle > 160 and height_diff < 0.3:
+                if shoulder_hip_angle > t["angle"] and height_diff < t["height"]:
                     stage = "holding"
                 else:
                     stage = "not holding"
 
                 if stage == "holding":
-                    counter += 0.033
+                    counter += frame_dt
 
                 if stage == "not holding":
-                    if height_diff >= 0.3:
+                    if height_diff >= t["height"]:
                         cv2.putText(image, "GET ON FLOOR!", (10, 100), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                    elif shoulder_hip_angle <= 160:
+                    elif shoulder_hip_angle <= t["angle"]:
                         cv2.putText(image, "STRAIGHTEN BACK!", (10, 100), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
 
                 cv2.putText(image, f"Angle: {int(shoulder_hip_angle)}", (10, 130),
@@ -275,8 +305,35 @@ with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as
                 cv2.putText(image, f"Time: {int(counter)}s", (10, 150),
                             cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
 
-        except:
-            pass
+            # --- Which side is being tracked / per-limb reps ---
+            if mode in UNILATERAL_MODES:
+                cv2.putText(image, f"L: {side_counts[0]}  R: {side_counts[1]}", (10, 170),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
+            if mode not in ("lunge", "jumping_jack"):  # These two always use both legs
+                cv2.putText(image, f"Tracking: {rep_counter.SIDE_NAMES[side_selector.side]}", (10, 190),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
+
+        except Exception:
+            # No person in frame is normal. Anything else is a real bug: don't end
+            # the workout over one bad frame, but don't hide it either.
+            if results.pose_landmarks is not None:
+                frame_errors += 1
+                if frame_errors == 1:
+                    traceback.print_exc()
+
+        if mode == "plank":
+            active_time = counter  # Plank's counter is the measured time spent holding
+        elif primary_angle is not None and stage is not None:
+            if prev_angle is not None and frame_dt > 0 and \
+                    abs(primary_angle - prev_angle) / frame_dt > MOVING_DEG_PER_SEC:
+                last_moving_time = now
+            if last_moving_time is not None and now - last_moving_time <= ACTIVE_GRACE:
+                active_time += frame_dt
+        prev_angle = primary_angle
+
+        if primary_angle is not None:
+            trace.append(now - start_time, primary_angle, stage)
+        journal.update(counter, stage, active_time, side_counts if mode in UNILATERAL_MODES else None)
 
         # --- DRAW THE BOX & TEXT (Shared Visuals) ---
         cv2.rectangle(image, (0, 0), (225, 73), (245, 117, 16), -1)
@@ -304,35 +361,27 @@ with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as
 
         cv2.imshow('Mediapipe Feed', image)
 
-        # EXIT LOGIC
+        # EXIT LOGIC ('q' pressed or the window was closed)
         if cv2.waitKey(10) & 0xFF == ord('q'):
-            if counter > 0:
-                # 1. CALCULATE CALORIES
-                cal_factor = 0.15
-                if mode == "squat":
-                    cal_factor = 0.50
-                elif mode == "pushup":
-                    cal_factor = 0.40
-                elif mode == "shoulder_press":
-                    cal_factor = 0.35
-                elif mode == "lunge":
-                    cal_factor = 0.45
-                elif mode == "jumping_jack":
-                    cal_factor = 0.20
-                elif mode == "plank":
-                    cal_factor = 0.06
-
-                calories_burned = round(counter * cal_factor, 2)
-
-                # 2. SAVE TO DATABASE
-                data = {
-                    'exercise_type': mode,
-                    'reps': counter,
-                    'score': calories_burned
-                }
-                database.save_workout(data)
-                print(f"Session Saved: {counter} reps, {calories_burned} calories.")
+            break
+        if cv2.getWindowProperty('Mediapipe Feed', cv2.WND_PROP_VISIBLE) < 1:
             break
 
     cap.release()
-    cv2.destroyAllWindows()
\ No newline at end of file
+    cv2.destroyAllWindows()
+
+# --- 5. SAVE SESSION ---
+# Runs however the loop ended (quit, window closed, camera lost).
+# Calories = MET x body weight x active time, see calories.py
+if counter > 0:
+    data = checkpoint.save_session(journal.session_id, mode, counter, active_time, user_id,
+                                   trace=telemetry.summarize(trace),
+                                   side_counts=side_counts if mode in UNILATERAL_MODES else None)
+    if data:
+        print(f"Session Saved: {counter} reps, {data['score']} calories.")
+    else:
+        print("Session already saved with more complete data; nothing changed.")
+journal.close()
+
+if frame_errors:
+    print(f"⚠️ {frame_errors} frames could not be processed (first error shown above).")
\ No newline at end of file
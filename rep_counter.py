@@ -0,0 +1,184 @@
+import json
+import os
+import numpy as np
+
+# --- 1. THRESHOLDS ---
+# Hand-tuned defaults used by main.py. Keys are named after the stage they switch to.
+# calibrate.py writes better values to thresholds.json, which overrides these per mode.
+DEFAULT_THRESHOLDS = {
+    "curl": {"down": 160, "up": 30},
+    "squat": {"up": 170, "down": 90},
+    "pushup": {"down": 80, "up": 160},
+    "shoulder_press": {"down": 90, "up": 140},
+    "lunge": {"up": 140, "down": 110, "spread": 0.15},
+    "jumping_jack": {"spread": 0.2},
+    "plank": {"angle": 160, "height": 0.3},
+}
+
+THRESHOLDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thresholds.json")
+
+# Plank "reps" are seconds held. The trainer times each holding frame with the clock and
+# calibration uses the clip's real frame rate; this (~30 fps) is only for clips whose fps is unknown.
+PLANK_SECONDS_PER_FRAME = 0.033
+
+
+def load_thresholds(path=THRESHOLDS_FILE):
+    thresholds = {mode: dict(values) for mode, values in DEFAULT_THRESHOLDS.items()}
+    try:
+        with open(path, "r") as f:
+            calibrated = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return thresholds
+
+    for mode, values in calibrated.items():
+        if mode in thresholds:
+            thresholds[mode].update(values)
+    return thresholds
+
+
+def save_thresholds(thresholds, path=THRESHOLDS_FILE):
+    with open(path, "w") as f:
+        json.dump(thresholds, f, indent=4)
+
+
+# --- 2. LANDMARK INDICES ---
+# Same numbering as mp_pose.PoseLandmark (kept here so we don't need mediapipe to do maths)
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_ELBOW, RIGHT_ELBOW = 13, 14
+LEFT_WRIST, RIGHT_WRIST = 15, 16
+LEFT_HIP, RIGHT_HIP = 23, 24
+LEFT_KNEE, RIGHT_KNEE = 25, 26
+LEFT_ANKLE, RIGHT_ANKLE = 27, 28
+
+# Kinematic chains (first, mid, end) as (left, right) pairs - the angle is taken at 'mid'
+ARM = ((LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST), (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST))
+LEG = ((LEFT_HIP, LEFT_KNEE, LEFT_ANKLE), (RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE))
+BODY = ((LEFT_SHOULDER, LEFT_HIP, LEFT_ANKLE), (RIGHT_SHOULDER, RIGHT_HIP, RIGHT_ANKLE))
+
+LEFT, RIGHT = 0, 1
+SIDE_NAMES = ("left", "right")
+
+# A limb whose weakest landmark is below this is treated as hidden (MediaPipe is guessing)
+MIN_VISIBILITY = 0.5
+# The other side must be seen this much better before we switch to it
+SIDE_SWITCH_MARGIN = 0.15
+
+
+# --- 3. VECTORIZED GEOMETRY ---
+def calculate_angles(a, b, c):
+    # Same as main.calculate_angle, but a/b/c are (N, 2) arrays -> N angles in one go
+    radians = np.arctan2(c[..., 1] - b[..., 1], c[..., 0] - b[..., 0]) - \
+              np.arctan2(a[..., 1] - b[..., 1], a[..., 0] - b[..., 0])
+    angle = np.abs(radians * 180.0 / np.pi)
+    return np.where(angle > 180.0, 360 - angle, angle)
+
+
+def bilateral_angles(points, chain):
+    # points: (..., 33, 4) x, y, z, visibility - one frame or a whole clip.
+    # Returns (angles, visibility), each (..., 2) for left/right, from a single NumPy pass.
+    # A chain's visibility is its weakest landmark: one hidden joint spoils the angle.
+    p = points[..., np.array(chain), :]  # (..., 2 sides, 3 joints, 4)
+    angles = calculate_angles(p[..., 0, :2], p[..., 1, :2], p[..., 2, :2])
+    return angles, p[..., 3].min(axis=-1)
+
+
+class SideSelector:
+    # Follows the better-seen side, with hysteresis so it doesn't flicker when both are similar
+    def __init__(self, margin=SIDE_SWITCH_MARGIN):
+        self.margin = margin
+        self.side = LEFT
+
+    def update(self, visibility):
+        other = 1 - self.side
+        if visibility[other] > visibility[self.side] + self.margin:
+            self.side = other
+        return self.side
+
+
+def select_sides(visibility, margin=SIDE_SWITCH_MARGIN):
+    # Runs a SideSelector over a whole clip: (frames, 2) visibility -> (frames,) side index
+    selector = SideSelector(margin)
+    return np.array([selector.update(v) for v in visibility], dtype=np.int8)
+
+
+def extract_features(landmarks, fps=None):
+    # landmarks: (frames, 33, 4) array of x, y, z, visibility; NaN rows = no pose found.
+    # fps: the clip's frame rate (None if unknown), used to turn plank frames into seconds.
+    # Everything the rep logic needs, computed once per clip so thresholds can be swept cheaply.
+    xy = landmarks[:, :, :2]
+    frames = np.arange(len(landmarks))
+    arm_angles, arm_vis = bilateral_angles(landmarks, ARM)
+    leg_angles, leg_vis = bilateral_angles(landmarks, LEG)
+    body_angles, body_vis = bilateral_angles(landmarks, BODY)
+    arm_side, leg_side, body_side = select_sides(arm_vis), select_sides(leg_vis), select_sides(body_vis)
+
+    shoulders = np.array([LEFT_SHOULDER, RIGHT_SHOULDER])[body_side]
+    ankles = np.array([LEFT_ANKLE, RIGHT_ANKLE])[body_side]
+    return {
+        "valid": ~np.isnan(xy[:, LEFT_SHOULDER, 0]),
+        "seconds_per_frame": 1.0 / fps if fps else PLANK_SECONDS_PER_FRAME,
+        "arm_angles": arm_angles,
+        "arm_visible": arm_vis >= MIN_VISIBILITY,
+        "elbow_angle": arm_angles[frames, arm_side],
+        "knee_angle": leg_angles[frames, leg_side],
+        "left_knee_angle": leg_angles[:, LEFT],
+        "right_knee_angle": leg_angles[:, RIGHT],
+        "body_angle": body_angles[frames, body_side],
+        "ankle_distance": np.abs(xy[:, LEFT_ANKLE, 0] - xy[:, RIGHT_ANKLE, 0]),
+        "height_diff": np.abs(xy[frames, shoulders, 1] - xy[frames, ankles, 1]),
+        "hands_up": (xy[:, LEFT_WRIST, 1] < xy[:, LEFT_SHOULDER, 1]) &
+                    (xy[:, RIGHT_WRIST, 1] < xy[:, RIGHT_SHOULDER, 1]),
+    }
+
+
+# --- 4. VECTORIZED REP COUNTING ---
+def _count_transitions(reset, count):
+    # The trainer's state machine: 'reset' arms the rep, 'count' scores it once.
+    # Keep only frames where something happens and count every reset -> count step.
+    events = np.where(reset, 1, np.where(count, -1, 0))
+    events = events[events != 0]
+    return int(np.count_nonzero((events[1:] == -1) & (events[:-1] == 1)))
+
+
+def count_reps(mode, features, t):
+    # Replays a whole clip through the same rules main.py applies frame by frame
+    valid = features["valid"]
+
+    if mode == "curl":
+        # Each arm has its own rep count (only while it is visible); the session is the better arm
+        counts = []
+        for side in (LEFT, RIGHT):
+            angle = features["arm_angles"][:, side]
+            seen = valid & features["arm_visible"][:, side]
+            counts.append(_count_transitions(seen & (angle > t["down"]), seen & (angle < t["up"])))
+        return max(counts)
+
+    elif mode == "squat":
+        angle = features["knee_angle"]
+        return _count_transitions(valid & (angle > t["up"]), valid & (angle < t["down"]))
+
+    elif mode == "pushup":
+        angle = features["elbow_angle"]
+        return _count_transitions(valid & (angle <= t["down"]), valid & (angle > t["up"]))
+
+    elif mode == "shoulder_press":
+        angle = features["elbow_angle"]
+        return _count_transitions(valid & (angle < t["down"]), valid & (angle > t["up"]))
+
+    elif mode == "lunge":
+        l_angle, r_angle = features["left_knee_angle"], features["right_knee_angle"]
+        reset = (l_angle > t["up"]) & (r_angle > t["up"])
+        count = ((l_angle < t["down"]) | (r_angle < t["down"])) & (features["ankle_distance"] > t["spread"])
+        return _count_transitions(valid & reset, valid & count)
+
+    elif mode == "jumping_jack":
+        feet_apart = features["ankle_distance"] > t["spread"]
+        hands_up = features["hands_up"]
+        return _count_transitions(valid & ~hands_up & ~feet_apart, valid & hands_up & feet_apart)
+
+    elif mode == "plank":
+        # Seconds actually held, same as the trainer's clock-based timer
+        holding = valid & (features["body_angle"] > t["angle"]) & (features["height_diff"] < t["height"])
+        return np.count_nonzero(holding) * features["seconds_per_frame"]
+
+    raise ValueError(f"Unknown mode: {mode}")
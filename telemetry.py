@@ -0,0 +1,86 @@
+import numpy as np
+
+# --- ANGLE TRACE TELEMETRY ---
+# main.py records the primary joint angle + stage of every frame into a fixed-size ring
+# buffer (plain NumPy arrays, nothing allocated per frame). At the end of the session the
+# trace is shrunk with LTTB to a few hundred points that still look like the real curve,
+# and packed into a small BLOB stored next to the workout for the History page.
+
+DEFAULT_CAPACITY = 36000  # ~20 minutes at 30 fps; older frames get overwritten after that
+TRACE_POINTS = 300
+
+STAGE_CODES = {None: 0, "up": 1, "down": 2, "holding": 3, "not holding": 4}
+STAGE_NAMES = {code: name for name, code in STAGE_CODES.items()}
+
+# 7 bytes per stored point: seconds since start, angle in degrees, stage code
+TRACE_DTYPE = np.dtype([('t', '<f4'), ('angle', '<f2'), ('stage', 'i1')])
+
+
+class AngleTrace:
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.float32)
+        self.angles = np.zeros(capacity, dtype=np.float32)
+        self.stages = np.zeros(capacity, dtype=np.int8)
+        self.count = 0  # total frames ever appended
+
+    def append(self, t, angle, stage):
+        i = self.count % self.capacity
+        self.times[i] = t
+        self.angles[i] = angle
+        self.stages[i] = STAGE_CODES.get(stage, 0)
+        self.count += 1
+
+    def series(self):
+        # Oldest -> newest, unrolling the ring if it has wrapped around
+        if self.count <= self.capacity:
+            n = self.count
+            return self.times[:n], self.angles[:n], self.stages[:n]
+        start = self.count % self.capacity
+        order = np.r_[start:self.capacity, 0:start]
+        return self.times[order], self.angles[order], self.stages[order]
+
+
+def lttb(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: returns the indices of n_out points that keep
+    # the visual shape of (x, y) - peaks and valleys of every rep survive.
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    bucket_edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    picked = np.empty(n_out, dtype=int)
+    picked[0], picked[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = bucket_edges[i], bucket_edges[i + 1]
+        # Average of the NEXT bucket is the third corner of the triangle
+        next_end = bucket_edges[i + 2] if i + 2 < len(bucket_edges) else n
+        avg_x = x[end:next_end].mean() if next_end > end else x[-1]
+        avg_y = y[end:next_end].mean() if next_end > end else y[-1]
+
+        # Point in this bucket making the largest triangle with the previous pick and that average
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        picked[i + 1] = a
+    return picked
+
+
+def summarize(trace, n_out=TRACE_POINTS):
+    # Downsample a whole session and pack it into bytes for the database
+    times, angles, stages = trace.series()
+    if len(times) == 0:
+        return None
+
+    keep = lttb(times.astype(np.float64), angles.astype(np.float64), n_out)
+    points = np.empty(len(keep), dtype=TRACE_DTYPE)
+    points['t'] = times[keep]
+    points['angle'] = angles[keep]
+    points['stage'] = stages[keep]
+    return points.tobytes()
+
+
+def decode(blob):
+    # Back to a structured array with 't', 'angle' and 'stage' fields
+    return np.frombuffer(blob, dtype=TRACE_DTYPE)